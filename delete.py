@@ -1,4 +1,6 @@
-import boto3
+import functools
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
 from botocore.exceptions import ClientError
 from dotenv import load_dotenv
 import os
@@ -10,28 +12,92 @@ load_dotenv()
 BUCKET_NAME = os.getenv("AWS_BUCKET_NAME")
 GLUE_DATABASE_NAME = os.getenv("GLUE_DATABASE_NAME")
 region = os.getenv("AWS_REGION", "us-east-1")
+
+# S3 DeleteObjects accepts at most 1000 keys per request
+DELETE_BATCH_SIZE = 1000
+# Deletions are I/O bound, so threads overlap the network round-trips; the
+# number of batches in flight is capped so listing cannot outrun deletion
+MAX_PENDING_BATCHES = 8
+# Glue BatchDeleteTable accepts at most 100 table names per request
+GLUE_TABLE_BATCH_SIZE = 100
+
+# AWS clients are created on first use so importing this module does not pay
+# for loading boto3; each client is built once and shared across threads
+_client_lock = threading.Lock()
+
+@functools.cache
+def _create_client(service_name):
+    import boto3
+    return boto3.Session(region_name=region).client(service_name)
+
+def get_client(service_name):
+    """Return the shared client for an AWS service, importing boto3 on first use."""
+    with _client_lock:
+        return _create_client(service_name)
+
 def bucket_exists(bucket_name):
     """Check if an S3 bucket exists."""
-    s3 = boto3.client("s3", region_name=region)
     try:
-        s3.head_bucket(Bucket=bucket_name)
+        get_client("s3").head_bucket(Bucket=bucket_name)
         return True
     except ClientError:
         return False
 
+def flush_delete_batch(bucket_name, batch):
+    """Delete a batch of objects with a single DeleteObjects request."""
+    response = get_client("s3").delete_objects(
+        Bucket=bucket_name,
+        Delete={"Objects": batch, "Quiet": True},
+    )
+    errors = response.get("Errors")
+    if errors:
+        print(f"Failed to delete {len(errors)} of {len(batch)} objects in bucket {bucket_name}: {errors}")
+    return len(batch) - len(errors or [])
+
+def iter_objects(bucket_name, prefix=""):
+    """Yield every object in the bucket under the given prefix, across all pages."""
+    paginator = get_client("s3").get_paginator("list_objects_v2")
+    pages = paginator.paginate(
+        Bucket=bucket_name,
+        Prefix=prefix,
+        PaginationConfig={"PageSize": DELETE_BATCH_SIZE},
+    )
+    for page in pages:
+        yield from page.get("Contents", [])
+
+def delete_objects_in_batches(bucket_name, objects):
+    """Delete the given objects in batches of up to DELETE_BATCH_SIZE keys.
+
+    Batches are deleted as soon as they fill up, and at most
+    MAX_PENDING_BATCHES are held in memory at once.
+    """
+    deleted = 0
+    pending = set()
+    batch = []
+    with ThreadPoolExecutor(max_workers=MAX_PENDING_BATCHES) as executor:
+        for obj in objects:
+            batch.append({"Key": obj["Key"]})
+            if len(batch) == DELETE_BATCH_SIZE:
+                if len(pending) >= MAX_PENDING_BATCHES:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    deleted += sum(future.result() for future in done)
+                pending.add(executor.submit(flush_delete_batch, bucket_name, batch))
+                batch = []
+        if batch:
+            pending.add(executor.submit(flush_delete_batch, bucket_name, batch))
+        return deleted + sum(future.result() for future in as_completed(pending))
+
 def delete_athena_query_results(bucket_name):
     """Delete Athena query results stored in the specified S3 bucket."""
-    s3 = boto3.client("s3")
     if not bucket_exists(bucket_name):
         print(f"Bucket {bucket_name} does not exist. Skipping Athena query result deletion.")
         return
     try:
         print(f"Deleting Athena query results in bucket: {bucket_name}")
-        objects = s3.list_objects_v2(Bucket=bucket_name, Prefix="athena-results/")
-        if "Contents" in objects:
-            for obj in objects["Contents"]:
-                s3.delete_object(Bucket=bucket_name, Key=obj["Key"])
-                print(f"Deleted Athena query result: {obj['Key']}")
+        objects = iter_objects(bucket_name, prefix="athena-results/")
+        deleted = delete_objects_in_batches(bucket_name, objects)
+        if deleted:
+            print(f"Deleted {deleted} Athena query results.")
         else:
             print(f"No Athena query results found in bucket {bucket_name}.")
     except ClientError as e:
@@ -39,44 +105,59 @@ def delete_athena_query_results(bucket_name):
 
 def delete_s3_bucket(bucket_name):
     """Delete a specific S3 bucket and its contents."""
-    s3 = boto3.client("s3")
     if not bucket_exists(bucket_name):
         print(f"Bucket {bucket_name} does not exist. Skipping deletion.")
         return
     try:
         print(f"Deleting bucket: {bucket_name}")
         # Delete all objects in the bucket
-        objects = s3.list_objects_v2(Bucket=bucket_name)
-        if "Contents" in objects:
-            for obj in objects["Contents"]:
-                s3.delete_object(Bucket=bucket_name, Key=obj["Key"])
-                print(f"Deleted object: {obj['Key']}")
+        objects = iter_objects(bucket_name)
+        deleted = delete_objects_in_batches(bucket_name, objects)
+        print(f"Deleted {deleted} objects.")
         # Delete the bucket
-        s3.delete_bucket(Bucket=bucket_name)
+        get_client("s3").delete_bucket(Bucket=bucket_name)
         print(f"Deleted bucket: {bucket_name}")
     except ClientError as e:
         print(f"Error deleting bucket {bucket_name}: {e}")
 
+def delete_glue_tables(database_name, table_names):
+    """Delete Glue tables in batches, retrying individually any the batch call reports as failed."""
+    for i in range(0, len(table_names), GLUE_TABLE_BATCH_SIZE):
+        batch = table_names[i:i + GLUE_TABLE_BATCH_SIZE]
+        response = get_client("glue").batch_delete_table(DatabaseName=database_name, TablesToDelete=batch)
+        failed = {error["TableName"] for error in response.get("Errors", [])}
+        for table_name in batch:
+            if table_name in failed:
+                get_client("glue").delete_table(DatabaseName=database_name, Name=table_name)
+            print(f"Deleted Glue table: {table_name} in database {database_name}")
+
 def delete_glue_resources(database_name):
     """Delete Glue database and associated tables."""
-    glue = boto3.client("glue", region_name=region)
     try:
         print(f"Deleting Glue database: {database_name}")
-        tables = glue.get_tables(DatabaseName=database_name)["TableList"]
-        for table in tables:
-            table_name = table["Name"]
-            print(f"Deleting Glue table: {table_name} in database {database_name}")
-            glue.delete_table(DatabaseName=database_name, Name=table_name)
-        glue.delete_database(Name=database_name)
+        paginator = get_client("glue").get_paginator("get_tables")
+        table_names = [
+            table["Name"]
+            for page in paginator.paginate(DatabaseName=database_name)
+            for table in page["TableList"]
+        ]
+        delete_glue_tables(database_name, table_names)
+        get_client("glue").delete_database(Name=database_name)
         print(f"Deleted Glue database: {database_name}")
     except ClientError as e:
         print(f"Error deleting Glue resources for database {database_name}: {e}")
 
 def main():
     print("Deleting resources created during data lake setup...")
-    delete_athena_query_results(BUCKET_NAME)
+    # Athena results and Glue resources are independent; the bucket must go last
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        futures = [
+            executor.submit(delete_athena_query_results, BUCKET_NAME),
+            executor.submit(delete_glue_resources, GLUE_DATABASE_NAME),
+        ]
+        for future in as_completed(futures):
+            future.result()
     delete_s3_bucket(BUCKET_NAME)
-    delete_glue_resources(GLUE_DATABASE_NAME)
     print("All specified resources deleted successfully.")
 
 if __name__ == "__main__":
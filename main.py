@@ -1,7 +1,16 @@
 import boto3
-import json
+import io
 import time
+import ijson
 import requests
+import pyarrow as pa
+import pyarrow.parquet as pq
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import islice
+from botocore.config import Config
+from botocore.exceptions import WaiterError
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from dotenv import load_dotenv
 import os
 
@@ -15,10 +24,61 @@ athena_output_location = f"s3://{bucket_name}/athena-results/"
 api_key = os.getenv("API_KEY")
 nba_endpoint = os.getenv("NBA_ENDPOINT")
 
+# Parquet schema for the raw player data; must match the Glue table columns
+PLAYER_SCHEMA = pa.schema([
+    ("PlayerID", pa.int32()),
+    ("FirstName", pa.string()),
+    ("LastName", pa.string()),
+    ("Team", pa.string()),
+    ("Position", pa.string()),
+    ("Experience", pa.int32()),
+    ("Height", pa.int32()),
+    ("Weight", pa.int32()),
+    ("Salary", pa.int32()),
+])
+
+# Number of player records converted per Parquet row group
+PARQUET_BATCH_SIZE = 1000
+
+# Athena queries
+TEAM_SALARY_QUERY = f"""
+SELECT 
+    Team, 
+    COUNT(PlayerID) AS PlayerCount,
+    SUM(Salary) AS TotalSalary
+FROM {glue_database_name}.nba_players
+GROUP BY Team
+LIMIT 20;
+"""
+
+# Shared client configuration: a larger keep-alive pool for concurrent calls
+# and adaptive retries for throttling
+client_config = Config(
+    max_pool_connections=50,
+    tcp_keepalive=True,
+    retries={"mode": "adaptive", "max_attempts": 10},
+    connect_timeout=5,
+    read_timeout=60,
+)
+
 # Create AWS clients
-s3_client = boto3.client("s3", region_name=region)
-glue_client = boto3.client("glue", region_name=region)
-athena_client = boto3.client("athena", region_name=region)
+s3_client = boto3.client("s3", region_name=region, config=client_config)
+glue_client = boto3.client("glue", region_name=region, config=client_config)
+athena_client = boto3.client("athena", region_name=region, config=client_config)
+
+# Shared HTTP session: keeps connections alive and retries throttled/failed requests
+http_session = requests.Session()
+http_session.mount(
+    "https://",
+    HTTPAdapter(
+        pool_maxsize=32,
+        max_retries=Retry(
+            total=5,
+            backoff_factor=0.2,
+            status_forcelist=[429, 500, 502, 503, 504],
+        ),
+    ),
+)
 
 def create_s3_bucket():
     """Create an S3 bucket for storing sports data."""
@@ -34,6 +94,17 @@ def create_s3_bucket():
     except Exception as e:
         print(f"Error creating S3 bucket: {e}")
 
+def wait_for_s3_bucket():
+    """Wait until the S3 bucket is visible instead of sleeping a fixed interval."""
+    try:
+        s3_client.get_waiter("bucket_exists").wait(
+            Bucket=bucket_name, WaiterConfig={"Delay": 1, "MaxAttempts": 10}
+        )
+        return True
+    except WaiterError as e:
+        print(f"Error waiting for S3 bucket '{bucket_name}': {e}")
+        return False
+
 def create_glue_database():
     """Create a Glue database for the data lake."""
     try:
@@ -48,37 +119,58 @@ def create_glue_database():
         print(f"Error creating Glue database: {e}")
 
 def fetch_nba_data():
-    """Fetch NBA player data from sportsdata.io."""
+    """Fetch NBA player data from sportsdata.io as a stream of player records."""
     try:
         headers = {"Ocp-Apim-Subscription-Key": api_key}
-        response = requests.get(nba_endpoint, headers=headers)
+        response = http_session.get(nba_endpoint, headers=headers, timeout=(3.05, 30), stream=True)
         response.raise_for_status()
-        print("Fetched NBA data successfully.")
-        return response.json()
+        # Let urllib3 undo any gzip/deflate transfer encoding before parsing
+        response.raw.decode_content = True
+        print("Connected to NBA API, streaming player data.")
+        return ijson.items(response.raw, "item", use_float=True)
     except Exception as e:
         print(f"Error fetching NBA data: {e}")
         return []
 
-def convert_to_line_delimited_json(data):
-    """Convert data to line-delimited JSON format."""
-    print("Converting data to line-delimited JSON format...")
-    return "\n".join([json.dumps(record) for record in data])
+def encode_parquet(data):
+    """Encode player records as a Snappy-compressed Parquet file in an in-memory buffer.
+
+    Records are consumed PARQUET_BATCH_SIZE at a time, so a streamed
+    response is never held in memory as a whole.
+    """
+    print("Converting data to Parquet format...")
+    records = iter(data)
+    buffer = io.BytesIO()
+    with pq.ParquetWriter(buffer, PLAYER_SCHEMA, compression="snappy") as writer:
+        while batch := list(islice(records, PARQUET_BATCH_SIZE)):
+            writer.write_table(pa.Table.from_pylist(batch, schema=PLAYER_SCHEMA))
+    buffer.seek(0)
+    return buffer
+
+def fetch_and_encode_nba_data():
+    """Fetch NBA player data and return it encoded as Parquet bytes.
 
-def upload_data_to_s3(data):
-    """Upload NBA data to the S3 bucket."""
+    Runs in a worker process so JSON parsing and Parquet encoding do not
+    compete for the GIL with the AWS calls made by the main process.
+    """
+    nba_data = fetch_nba_data()
+    if not nba_data:
+        return None
     try:
-        # Convert data to line-delimited JSON
-        line_delimited_data = convert_to_line_delimited_json(data)
+        # Convert data to Parquet so Athena only scans the columns it needs
+        return encode_parquet(nba_data).getvalue()
+    except Exception as e:
+        print(f"Error encoding NBA data: {e}")
+        return None
 
+def upload_data_to_s3(parquet_data):
+    """Upload Parquet-encoded NBA data to the S3 bucket."""
+    try:
         # Define S3 object key
-        file_key = "raw-data/nba_player_data.jsonl"
+        file_key = "raw-data/nba_player_data.parquet"
 
-        # Upload JSON data to S3
-        s3_client.put_object(
-            Bucket=bucket_name,
-            Key=file_key,
-            Body=line_delimited_data
-        )
+        # Upload Parquet data to S3 (large bodies are sent as a multipart upload)
+        s3_client.upload_fileobj(io.BytesIO(parquet_data), bucket_name, file_key)
         print(f"Uploaded data to S3: {file_key}")
     except Exception as e:
         print(f"Error uploading data to S3: {e}")
@@ -103,10 +195,10 @@ def create_glue_table():
                         {"Name": "Salary", "Type": "int"}
                     ],
                     "Location": f"s3://{bucket_name}/raw-data/",
-                    "InputFormat": "org.apache.hadoop.mapred.TextInputFormat",
-                    "OutputFormat": "org.apache.hadoop.hive.ql.io.HiveIgnoreKeyTextOutputFormat",
+                    "InputFormat": "org.apache.hadoop.hive.ql.io.parquet.MapredParquetInputFormat",
+                    "OutputFormat": "org.apache.hadoop.hive.ql.io.parquet.MapredParquetOutputFormat",
                     "SerdeInfo": {
-                        "SerializationLibrary": "org.openx.data.jsonserde.JsonSerDe"
+                        "SerializationLibrary": "org.apache.hadoop.hive.ql.io.parquet.serde.ParquetHiveSerDe"
                     },
                 },
                 "TableType": "EXTERNAL_TABLE",
@@ -116,18 +208,6 @@ def create_glue_table():
     except Exception as e:
         print(f"Error creating Glue table: {e}")
 
-def configure_athena():
-    """Set up Athena output location."""
-    try:
-        athena_client.start_query_execution(
-            QueryString="CREATE DATABASE IF NOT EXISTS nba_analytics",
-            QueryExecutionContext={"Database": glue_database_name},
-            ResultConfiguration={"OutputLocation": athena_output_location},
-        )
-        print("Athena output location configured successfully.")
-    except Exception as e:
-        print(f"Error configuring Athena: {e}")
-
 def run_athena_query(query, database_name, output_location):
     """Run a query in Athena."""
     try:
@@ -146,6 +226,8 @@ def run_athena_query(query, database_name, output_location):
 def wait_for_query_to_complete(query_execution_id):
     """Wait for an Athena query to complete and log errors if it fails."""
     try:
+        # Poll quickly at first so short queries return promptly, then back off
+        delay = 0.1
         while True:
             response = athena_client.get_query_execution(QueryExecutionId=query_execution_id)
             state = response['QueryExecution']['Status']['State']
@@ -154,7 +236,8 @@ def wait_for_query_to_complete(query_execution_id):
                     print("Query execution failed. Error details:")
                     print(response['QueryExecution']['Status']['StateChangeReason'])
                 return state
-            time.sleep(2)
+            time.sleep(delay)
+            delay = min(delay * 1.7, 5.0)
     except Exception as e:
         print(f"Error while waiting for query completion: {e}")
         return "FAILED"
@@ -172,17 +255,8 @@ def get_query_results(query_execution_id):
 
 def query_nba_data():
     """Run a SQL query to analyze NBA data in Athena."""
-    query = f"""
-    SELECT 
-        Team, 
-        COUNT(PlayerID) AS PlayerCount,
-        SUM(Salary) AS TotalSalary
-    FROM {glue_database_name}.nba_players
-    GROUP BY Team
-    LIMIT 20;
-    """
     print("Running SQL query in Athena...")
-    query_execution_id = run_athena_query(query, glue_database_name, athena_output_location)
+    query_execution_id = run_athena_query(TEAM_SALARY_QUERY, glue_database_name, athena_output_location)
     
     if query_execution_id:
         status = wait_for_query_to_complete(query_execution_id)
@@ -196,14 +270,25 @@ def query_nba_data():
 # Main workflow
 def main():
     print("Setting up data lake for NBA sports analytics...")
-    create_s3_bucket()
-    time.sleep(5) 
-    create_glue_database()
-    nba_data = fetch_nba_data()
-    if nba_data: 
-        upload_data_to_s3(nba_data)
-    create_glue_table()
-    configure_athena()
+    # Bucket creation, database creation and the API fetch are independent.
+    # The fetch is submitted first so its worker process is started before
+    # any threads exist.
+    with ProcessPoolExecutor(max_workers=1) as process_executor:
+        data_future = process_executor.submit(fetch_and_encode_nba_data)
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            executor.submit(create_s3_bucket)
+            executor.submit(create_glue_database)
+            bucket_ready = wait_for_s3_bucket()
+        parquet_data = data_future.result()
+    if not bucket_ready:
+        print("Aborting data lake setup.")
+        return
+    # The upload and table definition only depend on the bucket and database,
+    # so they run together; the query needs both
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        if parquet_data:
+            executor.submit(upload_data_to_s3, parquet_data)
+        executor.submit(create_glue_table)
     query_nba_data()
     print("Data lake setup complete.")
 